@@ -1,8 +1,15 @@
 # agents.py - Agent Definitions and Tool Functions
 
+import asyncio
 import os
+from functools import cache
+from itertools import islice
+from typing import Any
+import httpx
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.models.gemini import GeminiModel
+from pydantic_ai.providers.google_gla import GoogleGLAProvider
+from pydantic_ai.settings import ModelSettings
 from dotenv import load_dotenv
 
 # Import models
@@ -15,30 +22,43 @@ from models import (
     format_research_result,
     format_creative_result
 )
+from cache import LLMCache, ResponseCache
 
 # Load environment variables
 load_dotenv()
 
+GEMINI_MODEL_NAME = "gemini-2.0-flash-exp"
+
 # =============================================================================
 # INITIALIZE GEMINI MODEL
 # =============================================================================
 
+@cache
 def get_gemini_model():
-    """Get configured Gemini model"""
+    """Get configured Gemini model (built once and shared)"""
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("Please set GEMINI_API_KEY in your .env file")
-    return GeminiModel("gemini-2.0-flash-exp")
+    
+    # HTTP/2 lets concurrent agent calls share one connection to the Gemini API
+    http_client = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            retries=2,
+        ),
+        timeout=httpx.Timeout(timeout=600, connect=5),
+    )
+    return GeminiModel(GEMINI_MODEL_NAME, provider=GoogleGLAProvider(api_key=api_key, http_client=http_client))
+
+# One model instance shared by every agent
+_MODEL = get_gemini_model()
 
 # =============================================================================
-# SPECIALIZED AGENTS
+# SYSTEM PROMPTS
 # =============================================================================
 
-# Research Agent
-research_agent = Agent(
-    model=get_gemini_model(),
-    output_type=ResearchResult,
-    system_prompt="""You are a RESEARCH SPECIALIST AI agent. Your expertise includes:
+RESEARCH_PROMPT = """You are a RESEARCH SPECIALIST AI agent. Your expertise includes:
 
 🔍 RESEARCH CAPABILITIES:
 - Comprehensive topic analysis and investigation
@@ -54,14 +74,9 @@ research_agent = Agent(
 4. Assess confidence level honestly
 5. Recommend sources for verification
 
-🎯 FOCUS: Be objective, thorough, and indicate when information needs verification.""",
-)
+🎯 FOCUS: Be objective, thorough, and indicate when information needs verification."""
 
-# Code Analysis Agent
-code_agent = Agent(
-    model=get_gemini_model(),
-    output_type=CodeAnalysis,
-    system_prompt="""You are a SENIOR SOFTWARE ENGINEER AI agent specializing in code analysis. Your expertise:
+CODE_PROMPT = """You are a SENIOR SOFTWARE ENGINEER AI agent specializing in code analysis. Your expertise:
 
 💻 CODE ANALYSIS SKILLS:
 - Multi-language code review and assessment
@@ -77,14 +92,9 @@ code_agent = Agent(
 4. Provide actionable improvement suggestions
 5. Highlight security concerns
 
-🎯 FOCUS: Prioritize security, performance, maintainability, and code quality.""",
-)
+🎯 FOCUS: Prioritize security, performance, maintainability, and code quality."""
 
-# Creative Content Agent
-creative_agent = Agent(
-    model=get_gemini_model(),
-    output_type=CreativeContent,
-    system_prompt="""You are a CREATIVE WRITING AI agent with expertise in content creation. Your skills:
+CREATIVE_PROMPT = """You are a CREATIVE WRITING AI agent with expertise in content creation. Your skills:
 
 ✍️ CREATIVE CAPABILITIES:
 - Blog posts, articles, and marketing copy
@@ -100,13 +110,9 @@ creative_agent = Agent(
 4. Ensure proper structure and flow
 5. Provide appropriate titles and formatting
 
-🎯 FOCUS: Create high-quality, engaging content that serves the intended purpose.""",
-)
+🎯 FOCUS: Create high-quality, engaging content that serves the intended purpose."""
 
-# Coordinator Agent (Main orchestrator)
-coordinator_agent = Agent(
-    model=get_gemini_model(),
-    system_prompt="""You are the COORDINATOR AI agent managing a team of specialists:
+COORDINATOR_PROMPT = """You are the COORDINATOR AI agent managing a team of specialists:
 
 🤖 YOUR TEAM:
 - Research Agent: Handles research and information gathering
@@ -127,112 +133,223 @@ coordinator_agent = Agent(
 - For complex tasks → Use multiple agents
 - Always provide helpful, coordinated responses
 
-You have access to tools to delegate tasks to your specialist agents.""",
+You have access to tools to delegate tasks to your specialist agents."""
+
+# =============================================================================
+# SPECIALIZED AGENTS
+# =============================================================================
+
+# Research Agent
+research_agent = Agent(
+    model=_MODEL,
+    output_type=ResearchResult,
+    system_prompt=RESEARCH_PROMPT,
+)
+
+# Code Analysis Agent
+code_agent = Agent(
+    model=_MODEL,
+    output_type=CodeAnalysis,
+    system_prompt=CODE_PROMPT,
+)
+
+# Creative Content Agent
+creative_agent = Agent(
+    model=_MODEL,
+    output_type=CreativeContent,
+    system_prompt=CREATIVE_PROMPT,
+)
+
+# Coordinator Agent (Main orchestrator)
+coordinator_agent = Agent(
+    model=_MODEL,
+    system_prompt=COORDINATOR_PROMPT,
 )
 
 # =============================================================================
-# TOOL FUNCTIONS FOR AGENT COORDINATION
+# RESPONSE CACHE FOR SPECIALIST AGENTS
 # =============================================================================
 
-@coordinator_agent.tool
-async def delegate_research(ctx: RunContext[MultiAgentContext], topic: str) -> ResearchResult:
-    """Delegate research tasks to the research agent"""
-    ctx.deps.add_conversation("system", f"Delegating research: {topic}", "coordinator")
+response_cache = ResponseCache()
+llm_cache = LLMCache()
+
+# agent name -> (agent, output model, system prompt)
+SPECIALISTS = {
+    "research_agent": (research_agent, ResearchResult, RESEARCH_PROMPT),
+    "code_agent": (code_agent, CodeAnalysis, CODE_PROMPT),
+    "creative_agent": (creative_agent, CreativeContent, CREATIVE_PROMPT),
+}
+
+# Temperature 0 for steps that should reproduce their input rather than riff on it
+DETERMINISTIC_SETTINGS = ModelSettings(temperature=0.0)
+
+async def run_specialist(agent_name: str, prompt: str, deps: MultiAgentContext,
+                         use_cache: bool = True, normalize: bool = True,
+                         deterministic: bool = False):
+    """Run a specialist agent, reusing a cached output for repeated prompts
     
-    result = await research_agent.run(f"Research this topic: {topic}", deps=ctx.deps)
-    research_data = result.output
+    With deterministic=True the agent runs at temperature 0.
+    """
+    agent, output_type, system_prompt = SPECIALISTS[agent_name]
+    if use_cache:
+        cached = response_cache.get(agent_name, GEMINI_MODEL_NAME, system_prompt, prompt,
+                                    output_type, normalize=normalize)
+        if cached is not None:
+            deps.add_conversation("system", f"Cache hit for {agent_name}", "coordinator")
+            return cached
+    
+    model_settings = DETERMINISTIC_SETTINGS if deterministic else None
+    # Specialists have no tools or dynamic prompts, so they need no deps
+    result = await agent.run(prompt, model_settings=model_settings)
+    if use_cache:
+        response_cache.set(agent_name, GEMINI_MODEL_NAME, system_prompt, prompt, result.output, normalize)
+    return result.output
+
+# Prepended to content requests that already carry their structure
+SKIP_RESTRUCTURE_INSTRUCTION = (
+    "You have been given pre-structured content. Output it with minimal rewrite; do not re-plan sections."
+)
+
+# =============================================================================
+# TASK BOOKKEEPING
+# =============================================================================
+
+# task type -> one-line summary of an agent result for the task history
+RESULT_SUMMARIES = {
+    "research": lambda r: f"Researched: {r.topic} (Confidence: {r.confidence_level})",
+    "code_analysis": lambda r: f"Analyzed {r.language} code (Complexity: {r.complexity_score}/10)",
+    "content_creation": lambda r: f"Created {r.content_type}: {r.title} ({r.word_count} words)",
+}
+
+async def finalize_task(deps: MultiAgentContext, agent_name: str, task_type: str, result: Any,
+                        conversation_entry: str):
+    """Build the task summary for an agent result and record both
     
-    # Store result and create task summary
-    ctx.deps.store_agent_result("research_agent", research_data)
+    Scheduled in the background so tools can return to the coordinator first.
+    """
     task_summary = TaskSummary(
-        task_type="research",
-        agents_used=["research_agent"],
+        task_type=task_type,
+        agents_used=[agent_name],
         status="completed",
-        result_summary=f"Researched: {research_data.topic} (Confidence: {research_data.confidence_level})"
+        result_summary=RESULT_SUMMARIES[task_type](result)
     )
-    ctx.deps.add_task_result(task_summary)
+    deps.record_task(agent_name, result, task_summary, conversation_entry)
+
+# =============================================================================
+# TOOL FUNCTIONS FOR AGENT COORDINATION
+# =============================================================================
+
+@coordinator_agent.tool
+async def delegate_research(ctx: RunContext[MultiAgentContext], topic: str, use_cache: bool = True) -> ResearchResult:
+    """Delegate research tasks to the research agent"""
+    return await run_research(ctx.deps, topic, use_cache)
+
+async def run_research(deps: MultiAgentContext, topic: str, use_cache: bool = True) -> ResearchResult:
+    """Run the research agent and record the task"""
+    research_data = await run_specialist("research_agent", f"Research this topic: {topic}", deps, use_cache)
+    deps.schedule(finalize_task(deps, "research_agent", "research", research_data, f"Delegated research: {topic}"))
     
     return research_data
 
 @coordinator_agent.tool
-async def delegate_code_analysis(ctx: RunContext[MultiAgentContext], code: str, language: str = "auto-detect") -> CodeAnalysis:
+async def delegate_code_analysis(ctx: RunContext[MultiAgentContext], code: str, language: str = "auto-detect",
+                                 use_cache: bool = True) -> CodeAnalysis:
     """Delegate code analysis to the code agent"""
-    ctx.deps.add_conversation("system", f"Delegating code analysis for {language}", "coordinator")
-    
-    result = await code_agent.run(f"Analyze this {language} code:\n\n```\n{code}\n```", deps=ctx.deps)
-    code_data = result.output
-    
-    # Store result and create task summary
-    ctx.deps.store_agent_result("code_agent", code_data)
-    task_summary = TaskSummary(
-        task_type="code_analysis",
-        agents_used=["code_agent"],
-        status="completed",
-        result_summary=f"Analyzed {code_data.language} code (Complexity: {code_data.complexity_score}/10)"
-    )
-    ctx.deps.add_task_result(task_summary)
+    # Case and indentation are significant in code, so key on the raw prompt
+    code_data = await run_specialist("code_agent", f"Analyze this {language} code:\n\n```\n{code}\n```",
+                                     ctx.deps, use_cache, normalize=False)
+    ctx.deps.schedule(finalize_task(ctx.deps, "code_agent", "code_analysis", code_data,
+                                    f"Delegated code analysis for {language}"))
     
     return code_data
 
 @coordinator_agent.tool
 async def delegate_content_creation(ctx: RunContext[MultiAgentContext], content_request: str, 
                                   content_type: str = "article", audience: str = "general", 
-                                  tone: str = "professional") -> CreativeContent:
-    """Delegate creative content creation to the creative agent"""
-    ctx.deps.add_conversation("system", f"Delegating content creation: {content_type}", "coordinator")
+                                  tone: str = "professional", use_cache: bool = True,
+                                  skip_restructure: bool = False) -> CreativeContent:
+    """Delegate creative content creation to the creative agent
     
+    Set skip_restructure when the request is already structured and only needs writing up.
+    """
+    return await run_content_creation(ctx.deps, content_request, content_type, audience, tone, use_cache,
+                                      skip_restructure=skip_restructure)
+
+async def run_content_creation(deps: MultiAgentContext, content_request: str, content_type: str = "article",
+                               audience: str = "general", tone: str = "professional", use_cache: bool = True,
+                               deterministic: bool = False, skip_restructure: bool = False) -> CreativeContent:
+    """Run the creative agent and record the task"""
     prompt = f"Create {content_type} content about: {content_request}. Target audience: {audience}. Tone: {tone}"
-    result = await creative_agent.run(prompt, deps=ctx.deps)
-    creative_data = result.output
-    
-    # Store result and create task summary
-    ctx.deps.store_agent_result("creative_agent", creative_data)
-    task_summary = TaskSummary(
-        task_type="content_creation",
-        agents_used=["creative_agent"],
-        status="completed",
-        result_summary=f"Created {creative_data.content_type}: {creative_data.title} ({creative_data.word_count} words)"
-    )
-    ctx.deps.add_task_result(task_summary)
+    if skip_restructure:
+        prompt = f"{SKIP_RESTRUCTURE_INSTRUCTION}\n\n{prompt}"
+        deterministic = True
+    creative_data = await run_specialist("creative_agent", prompt, deps, use_cache, deterministic=deterministic)
+    deps.schedule(finalize_task(deps, "creative_agent", "content_creation", creative_data,
+                                f"Delegated content creation: {content_type}"))
     
     return creative_data
 
 @coordinator_agent.tool
 async def get_task_history(ctx: RunContext[MultiAgentContext]) -> str:
     """Get summary of completed tasks"""
+    await ctx.deps.drain()
     if not ctx.deps.task_history:
         return "No tasks completed yet in this session."
     
     summary = f"📊 Session {ctx.deps.session_id} - {len(ctx.deps.task_history)} tasks completed:\n\n"
-    for i, task in enumerate(ctx.deps.task_history[-5:], 1):  # Last 5 tasks
+    start = max(0, len(ctx.deps.task_history) - 5)
+    for i, task in enumerate(islice(ctx.deps.task_history, start, None), 1):  # Last 5 tasks
         summary += f"{i}. {task.task_type.upper()}: {task.result_summary}\n"
         summary += f"   Agents: {', '.join(task.agents_used)} | Status: {task.status}\n\n"
     
     return summary
 
 @coordinator_agent.tool
-async def complex_research_analysis(ctx: RunContext[MultiAgentContext], topic: str) -> str:
+async def complex_research_analysis(ctx: RunContext[MultiAgentContext], topic: str, use_cache: bool = True) -> str:
     """Perform complex analysis using multiple agents"""
-    ctx.deps.add_conversation("system", f"Starting complex analysis: {topic}", "coordinator")
+    return await run_complex_analysis(ctx.deps, topic, use_cache)
+
+async def run_complex_analysis(deps: MultiAgentContext, topic: str, use_cache: bool = True) -> str:
+    """Research a topic and write a report on it"""
+    deps.add_conversation("system", f"Starting complex analysis: {topic}", "coordinator")
     
-    # First, research the topic
-    research_result = await delegate_research(ctx, topic)
+    # Research the topic while the creative agent drafts the report outline,
+    # which only needs the topic
+    research_result, outline = await asyncio.gather(
+        run_research(deps, topic, use_cache),
+        run_specialist("creative_agent", f"Draft a report outline for: {topic}", deps, use_cache),
+    )
     
-    # Then create a summary report
-    report_request = f"Create a comprehensive report based on this research: {research_result.summary}. Include the key points: {', '.join(research_result.key_points)}"
-    content_result = await delegate_content_creation(ctx, report_request, "report", "professional", "analytical")
+    # Then write up the report from the outline as given
+    report_request = (
+        f"Create a comprehensive report based on this research: {research_result.summary}. "
+        f"Include the key points: {', '.join(research_result.key_points)}. "
+        f"Follow this outline:\n{outline.content}"
+    )
+    content_result = await run_content_creation(deps, report_request, "report", "professional", "analytical",
+                                                use_cache, skip_restructure=True)
     
-    # Create combined task summary
+    # Create combined task summary, after the sub-task summaries
+    await deps.drain()
     task_summary = TaskSummary(
         task_type="complex_analysis",
         agents_used=["research_agent", "creative_agent"],
         status="completed",
         result_summary=f"Complex analysis of '{topic}' with research and report generation"
     )
-    ctx.deps.add_task_result(task_summary)
+    deps.add_task_result(task_summary)
     
     return f"🔍 RESEARCH COMPLETED\n{format_research_result(research_result)}\n\n📄 ANALYSIS REPORT\n{format_creative_result(content_result)}"
 
+# Tool names that shape coordinator responses, used in LLM cache keys
+COORDINATOR_TOOLS = (
+    delegate_research.__name__,
+    delegate_code_analysis.__name__,
+    delegate_content_creation.__name__,
+    get_task_history.__name__,
+    complex_research_analysis.__name__,
+)
+
 # =============================================================================
 # EXPORT ALL AGENTS
 # =============================================================================
@@ -242,5 +359,8 @@ __all__ = [
     'code_agent', 
     'creative_agent',
     'coordinator_agent',
-    'get_gemini_model'
+    'get_gemini_model',
+    'run_complex_analysis',
+    'response_cache',
+    'llm_cache'
 ]
\ No newline at end of file
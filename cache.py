@@ -0,0 +1,110 @@
+# cache.py - Response Caching for Agent Calls
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar
+
+import orjson
+from diskcache import Cache
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+# =============================================================================
+# PROMPT NORMALIZATION HELPERS
+# =============================================================================
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase a prompt and collapse whitespace"""
+    return " ".join(prompt.lower().split())
+
+# =============================================================================
+# RESPONSE CACHE FOR SPECIALIST AGENT OUTPUTS
+# =============================================================================
+
+class ResponseCache:
+    """In-memory LRU cache of structured agent outputs keyed by agent, model, system prompt and prompt.
+
+    Only exact repeats are served; there is no near-duplicate matching.
+    Outputs are stored as JSON and re-validated on the way out.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def cache_key(agent: str, model_name: str, system_prompt: str, prompt: str, normalize: bool = True) -> str:
+        """Deterministic key for an agent call
+        
+        With normalize=False the raw prompt is hashed, for prompts where case
+        and whitespace matter (such as source code).
+        """
+        if normalize:
+            prompt = normalize_prompt(prompt)
+        return LLMCache.cache_key(
+            model_name,
+            [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}],
+            agent=agent,
+        )
+
+    def get(self, agent: str, model_name: str, system_prompt: str, prompt: str,
+            output_type: Type[T], normalize: bool = True) -> Optional[T]:
+        """Return a cached output for this prompt, or None on a miss"""
+        key = self.cache_key(agent, model_name, system_prompt, prompt, normalize)
+        payload = self._entries.get(key)
+        if payload is None:
+            return None
+        self._entries.move_to_end(key)
+        return output_type.model_validate_json(payload)
+
+    def set(self, agent: str, model_name: str, system_prompt: str, prompt: str, output: BaseModel,
+            normalize: bool = True):
+        """Store an agent output, evicting the least recently used one when full"""
+        key = self.cache_key(agent, model_name, system_prompt, prompt, normalize)
+        self._entries[key] = output.model_dump_json()
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached outputs"""
+        self._entries.clear()
+
+# =============================================================================
+# EXACT-MATCH LLM RESPONSE CACHE
+# =============================================================================
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.research_agent_cache")
+
+class LLMCache:
+    """Disk-backed cache of LLM responses keyed on the exact request"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, expire: Optional[float] = 24 * 60 * 60):
+        self.expire = expire
+        self._cache = Cache(directory)
+
+    @staticmethod
+    def cache_key(model: str, messages: List[Dict[str, str]], tools: Iterable[str] = (),
+                  **params: Any) -> str:
+        """Deterministic key for a model request"""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "tools": sorted(tools),
+            "params": params,
+        }
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached response for a key, or None on a miss"""
+        return self._cache.get(key)
+
+    def set(self, key: str, response: Any):
+        """Store a response under a key"""
+        self._cache.set(key, response, expire=self.expire)
+
+    def clear(self):
+        """Drop all cached responses"""
+        self._cache.clear()
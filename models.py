@@ -1,23 +1,36 @@
 # models.py - Pydantic Models for Multi-Agent System
 
-from typing import List, Dict, Any
+import asyncio
+from collections import deque
+from itertools import islice
+import threading
+import time
+from typing import Coroutine, Deque, List, Dict, Any, Set
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 # =============================================================================
 # PYDANTIC MODELS FOR DIFFERENT AGENT OUTPUTS
 # =============================================================================
 
+# Keep validation on pydantic-core's fast path: no re-validation on assignment
+# and unknown fields from the LLM are dropped rather than checked
+FAST_MODEL_CONFIG = ConfigDict(validate_assignment=False, extra="ignore", frozen=False, str_strip_whitespace=False)
+
 class ResearchResult(BaseModel):
     """Research agent output model"""
+    model_config = FAST_MODEL_CONFIG
+    
     topic: str = Field(..., description="The research topic")
     summary: str = Field(..., description="Brief summary of findings")
-    key_points: List[str] = Field(..., description="3-5 key findings", min_items=3, max_items=5)
+    key_points: List[str] = Field(..., description="3-5 key findings")
     confidence_level: str = Field(..., description="High, Medium, or Low confidence")
     sources_needed: List[str] = Field(default_factory=list, description="Recommended sources")
 
 class CodeAnalysis(BaseModel):
     """Code analysis agent output model"""
+    model_config = FAST_MODEL_CONFIG
+    
     language: str = Field(..., description="Programming language detected")
     complexity_score: int = Field(..., ge=1, le=10, description="Code complexity (1-10)")
     issues_found: List[str] = Field(default_factory=list, description="Issues identified")
@@ -26,6 +39,8 @@ class CodeAnalysis(BaseModel):
 
 class CreativeContent(BaseModel):
     """Creative content agent output model"""
+    model_config = FAST_MODEL_CONFIG
+    
     content_type: str = Field(..., description="Type of content created")
     title: str = Field(..., description="Content title")
     content: str = Field(..., description="The actual content")
@@ -35,23 +50,36 @@ class CreativeContent(BaseModel):
 
 class TaskSummary(BaseModel):
     """Task coordination output model"""
+    model_config = FAST_MODEL_CONFIG
+    
     task_type: str = Field(..., description="Type of task performed")
     agents_used: List[str] = Field(..., description="Agents involved")
     status: str = Field(..., description="Task completion status")
     result_summary: str = Field(..., description="Brief summary of results")
-    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
+    timestamp: float = Field(default_factory=time.time, description="Unix time of completion")
+    
+    @property
+    def timestamp_iso(self) -> str:
+        """Completion time as an ISO 8601 string"""
+        return datetime.fromtimestamp(self.timestamp).isoformat()
 
 # =============================================================================
 # AGENT CONTEXT FOR COORDINATION
 # =============================================================================
 
+MAX_CONVERSATION_HISTORY = 256
+MAX_TASK_HISTORY = 1024
+
 class MultiAgentContext:
     """Context class to manage multi-agent coordination"""
     
     def __init__(self):
-        self.conversation_history: List[Dict[str, Any]] = []
-        self.task_history: List[TaskSummary] = []
+        # Bounded so long sessions drop their oldest entries
+        self.conversation_history: Deque[Dict[str, Any]] = deque(maxlen=MAX_CONVERSATION_HISTORY)
+        self.task_history: Deque[TaskSummary] = deque(maxlen=MAX_TASK_HISTORY)
         self.agent_results: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._pending_tasks: Set[asyncio.Task] = set()
         self.session_id: str = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     def add_conversation(self, role: str, content: str, agent_name: str = "system"):
@@ -60,7 +88,7 @@ class MultiAgentContext:
             "role": role,
             "content": content,
             "agent": agent_name,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": time.time()
         })
     
     def add_task_result(self, task_summary: TaskSummary):
@@ -71,9 +99,38 @@ class MultiAgentContext:
         """Store result from specific agent"""
         self.agent_results[agent_name] = result
     
+    def record_task(self, agent_name: str, result: Any, task_summary: TaskSummary, conversation_entry: str):
+        """Store an agent result, its task summary and a log entry in one update"""
+        with self._lock:
+            self.add_conversation("system", conversation_entry, "coordinator")
+            self.store_agent_result(agent_name, result)
+            self.add_task_result(task_summary)
+    
+    def schedule(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """Run bookkeeping in the background, keeping a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._pending_tasks.add(task)
+        task.add_done_callback(self._finish_task)
+        return task
+    
+    def _finish_task(self, task: asyncio.Task):
+        """Forget a finished background task, recording its failure if it raised"""
+        self._pending_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.add_conversation("system", f"❌ Background task failed: {task.exception()}", "error")
+    
+    async def drain(self):
+        """Wait for all scheduled bookkeeping to finish
+        
+        Failures are recorded by the task itself and never raised here.
+        """
+        if self._pending_tasks:
+            await asyncio.gather(*self._pending_tasks, return_exceptions=True)
+    
     def get_recent_context(self, limit: int = 5) -> str:
         """Get recent conversation context"""
-        recent = self.conversation_history[-limit:] if self.conversation_history else []
+        start = max(0, len(self.conversation_history) - limit)
+        recent = islice(self.conversation_history, start, None)
         return "\n".join([f"[{entry['agent']}] {entry['role']}: {entry['content']}" for entry in recent])
 
 # =============================================================================
@@ -82,39 +139,40 @@ class MultiAgentContext:
 
 def format_research_result(result: ResearchResult) -> str:
     """Format research results for display"""
-    output = f"📊 Topic: {result.topic}\n"
-    output += f"📝 Summary: {result.summary}\n"
-    output += f"🔑 Key Points:\n"
-    for i, point in enumerate(result.key_points, 1):
-        output += f"   {i}. {point}\n"
-    output += f"📈 Confidence: {result.confidence_level}\n"
+    lines = [
+        f"📊 Topic: {result.topic}",
+        f"📝 Summary: {result.summary}",
+        "🔑 Key Points:",
+    ]
+    lines.extend(f"   {i}. {point}" for i, point in enumerate(result.key_points, 1))
+    lines.append(f"📈 Confidence: {result.confidence_level}")
     if result.sources_needed:
-        output += f"📚 Recommended Sources: {', '.join(result.sources_needed)}\n"
-    return output
+        lines.append(f"📚 Recommended Sources: {', '.join(result.sources_needed)}")
+    return "\n".join(lines) + "\n"
 
 def format_code_result(result: CodeAnalysis) -> str:
     """Format code analysis results for display"""
-    output = f"💻 Language: {result.language}\n"
-    output += f"📊 Complexity Score: {result.complexity_score}/10\n"
+    lines = [
+        f"💻 Language: {result.language}",
+        f"📊 Complexity Score: {result.complexity_score}/10",
+    ]
     if result.issues_found:
-        output += f"⚠️  Issues Found:\n"
-        for issue in result.issues_found:
-            output += f"   • {issue}\n"
+        lines.append("⚠️  Issues Found:")
+        lines.extend(f"   • {issue}" for issue in result.issues_found)
     if result.suggestions:
-        output += f"💡 Suggestions:\n"
-        for suggestion in result.suggestions:
-            output += f"   • {suggestion}\n"
+        lines.append("💡 Suggestions:")
+        lines.extend(f"   • {suggestion}" for suggestion in result.suggestions)
     if result.security_concerns:
-        output += f"🔒 Security Concerns:\n"
-        for concern in result.security_concerns:
-            output += f"   • {concern}\n"
-    return output
+        lines.append("🔒 Security Concerns:")
+        lines.extend(f"   • {concern}" for concern in result.security_concerns)
+    return "\n".join(lines) + "\n"
 
 def format_creative_result(result: CreativeContent) -> str:
     """Format creative content results for display"""
-    output = f"✍️  Content Type: {result.content_type}\n"
-    output += f"📝 Title: {result.title}\n"
-    output += f"🎯 Audience: {result.target_audience} | Tone: {result.tone}\n"
-    output += f"📊 Word Count: {result.word_count}\n"
-    output += f"📄 Content:\n{result.content}\n"
-    return output
\ No newline at end of file
+    return "\n".join([
+        f"✍️  Content Type: {result.content_type}",
+        f"📝 Title: {result.title}",
+        f"🎯 Audience: {result.target_audience} | Tone: {result.tone}",
+        f"📊 Word Count: {result.word_count}",
+        f"📄 Content:\n{result.content}",
+    ]) + "\n"
\ No newline at end of file
@@ -1,16 +1,92 @@
 # multi_agent.py - Modularized Multi-Agent System
 
 import os
+import sys
 import asyncio
-from pydantic_ai import RunContext
-from dotenv import load_dotenv
+from typing import AsyncIterator, List, Set, Tuple
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import (
+    AgentStreamEvent,
+    ModelMessage,
+    PartDeltaEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta,
+    ToolCallPart,
+    ToolReturnPart
+)
 
-# Import models and agents
+# Import models and agents (agents loads the .env file)
 from models import MultiAgentContext
-from agents import coordinator_agent, get_task_history
+from agents import (
+    coordinator_agent,
+    get_task_history,
+    llm_cache,
+    COORDINATOR_PROMPT,
+    COORDINATOR_TOOLS,
+    GEMINI_MODEL_NAME
+)
+from plan_templates import match_plan_template
 
-# Load environment variables
-load_dotenv()
+# Interactive session commands
+QUIT_COMMANDS = frozenset({"quit", "exit", "bye", "q"})
+HISTORY_COMMAND = "history"
+
+# Streamed text shorter than this is held until the model shows it is not
+# about to call a tool
+STREAM_HOLDBACK_CHARS = 200
+
+def _executed_tools(messages: List[ModelMessage]) -> Set[str]:
+    """Names of the tools that returned results during a run"""
+    return {
+        part.tool_name
+        for message in messages
+        for part in message.parts
+        if isinstance(part, ToolReturnPart)
+    }
+
+async def _stream_response_text(events: AsyncIterator[AgentStreamEvent]):
+    """Write one model response's text to stdout as it arrives
+    
+    Text is held back until it reaches STREAM_HOLDBACK_CHARS, and dropped if
+    the response calls a tool first, so a preamble such as "Let me research
+    that..." is not printed as if it were the answer.
+    """
+    pending: List[str] = []
+    pending_chars = 0
+    flushing = False
+    seen_text = False
+    async for event in events:
+        text = ""
+        if isinstance(event, PartStartEvent):
+            if isinstance(event.part, ToolCallPart):
+                if flushing:
+                    _write_stream("\n")
+                return
+            if isinstance(event.part, TextPart):
+                text = ("\n\n" if seen_text else "") + event.part.content
+                seen_text = True
+        elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+            text = event.delta.content_delta
+        if not text:
+            continue
+        
+        if flushing:
+            _write_stream(text)
+            continue
+        pending.append(text)
+        pending_chars += len(text)
+        if pending_chars >= STREAM_HOLDBACK_CHARS:
+            flushing = True
+            _write_stream("".join(pending))
+    
+    if not flushing:
+        _write_stream("".join(pending))
+
+def _write_stream(text: str):
+    """Write streamed text to stdout without buffering"""
+    sys.stdout.write(text)
+    sys.stdout.flush()
 
 # =============================================================================
 # MAIN MULTI-AGENT SYSTEM CLASS
@@ -23,20 +99,46 @@ class MultiAgentSystem:
         self.context = MultiAgentContext()
         self.is_running = False
     
-    async def process_request(self, user_input: str) -> str:
-        """Process user request through the coordinator agent"""
+    async def process_request(self, user_input: str, stream: bool = False, use_cache: bool = True) -> str:
+        """Process user request through the coordinator agent
+        
+        With stream=True the response is also written to stdout as it arrives.
+        With use_cache=False the coordinator is always called and nothing is cached.
+        """
         try:
+            # The coordinator only sees the user input, so a reply that used no
+            # tools depends on nothing else and can be reused across sessions
+            cache_key = llm_cache.cache_key(
+                GEMINI_MODEL_NAME,
+                [
+                    {"role": "system", "content": COORDINATOR_PROMPT},
+                    {"role": "user", "content": user_input},
+                ],
+                COORDINATOR_TOOLS,
+            )
+            
             # Add user message to context
             self.context.add_conversation("user", user_input, "user")
             
-            # Get coordinator's response
-            result = await coordinator_agent.run(user_input, deps=self.context)
-            
-            # Format and return response
-            if hasattr(result, 'output'):
-                response = str(result.output)
+            plan = match_plan_template(user_input)
+            response = llm_cache.get(cache_key) if plan is None and use_cache else None
+            if plan is not None:
+                # Known workflow: run its steps directly instead of asking the coordinator to plan
+                template, topic = plan
+                print(f"🗺️  Using {template.name} plan ({' → '.join(template.steps)}) for: {topic}")
+                response = await template.run(self.context, topic)
+                if stream:
+                    _write_stream(response)
+            elif response is not None:
+                print(f"🎯 cache hit (saved ~{len(response) // 4} tokens)")
+                if stream:
+                    _write_stream(response)
             else:
-                response = str(result)
+                response, messages = await self._run_coordinator(user_input, stream)
+                # Tool results depend on session state and specialist calls, so
+                # only replies the coordinator wrote on its own are cached
+                if use_cache and not _executed_tools(messages):
+                    llm_cache.set(cache_key, response)
             
             self.context.add_conversation("assistant", response, "coordinator")
             return response
@@ -44,8 +146,29 @@ class MultiAgentSystem:
         except Exception as e:
             error_msg = f"❌ Error processing request: {str(e)}"
             self.context.add_conversation("system", error_msg, "error")
+            if stream:
+                _write_stream(f"\n{error_msg}")
             return error_msg
     
+    async def _run_coordinator(self, user_input: str, stream: bool) -> Tuple[str, List[ModelMessage]]:
+        """Get the coordinator's response and run messages, streaming to stdout if requested"""
+        if stream:
+            # Drive the run node by node so tool calls still execute, and only
+            # print the text of the response that answers the user
+            async with coordinator_agent.iter(user_input, deps=self.context) as run:
+                async for node in run:
+                    if Agent.is_model_request_node(node):
+                        async with node.stream(run.ctx) as request_stream:
+                            await _stream_response_text(request_stream)
+            return str(run.result.output), run.result.all_messages()
+        
+        result = await coordinator_agent.run(user_input, deps=self.context)
+        
+        # Format and return response
+        if hasattr(result, 'output'):
+            return str(result.output), result.all_messages()
+        return str(result), result.all_messages()
+    
     async def run_interactive_session(self):
         """Run interactive multi-agent session"""
         print("🤖 MULTI-AGENT SYSTEM STARTED!")
@@ -67,12 +190,13 @@ class MultiAgentSystem:
         while self.is_running:
             try:
                 user_input = input("\n💬 You: ").strip()
+                command = user_input.lower()
                 
-                if user_input.lower() in ['quit', 'exit', 'bye', 'q']:
+                if command in QUIT_COMMANDS:
                     print("👋 Multi-Agent System shutting down. Goodbye!")
                     break
                 
-                if user_input.lower() == 'history':
+                if command == HISTORY_COMMAND:
                     history = await get_task_history(RunContext(self.context))
                     print(f"\n{history}")
                     continue
@@ -81,8 +205,9 @@ class MultiAgentSystem:
                     continue
                 
                 print("\n🤖 Coordinating agents...")
-                response = await self.process_request(user_input)
-                print(f"\n📋 Response:\n{response}")
+                print("\n📋 Response:")
+                await self.process_request(user_input, stream=True)
+                print()
                 
             except KeyboardInterrupt:
                 print("\n\n👋 Session interrupted. Goodbye!")
@@ -140,7 +265,9 @@ async def main():
         
         # Quick test
         system = MultiAgentSystem()
-        test_response = await system.process_request("Hello, can you help me research Python programming?")
+        # Always hit the API here so a bad key or network is caught
+        test_response = await system.process_request("Hello, can you help me research Python programming?",
+                                                     use_cache=False)
         
         if test_response and not test_response.startswith("❌"):
             print("✅ Multi-agent system ready!")
@@ -0,0 +1,49 @@
+# plan_templates.py - Known Workflows That Skip Coordinator Planning
+
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from models import MultiAgentContext
+from agents import run_complex_analysis
+
+# =============================================================================
+# PLAN TEMPLATES
+# =============================================================================
+
+class PlanTemplate:
+    """Recurring request pattern mapped directly to a multi-agent workflow"""
+
+    def __init__(self, name: str, pattern: str, steps: Tuple[str, ...],
+                 run: Callable[[MultiAgentContext, str], Awaitable[str]]):
+        self.name = name
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.steps = steps
+        self.run = run
+
+    def match(self, user_input: str) -> Optional[str]:
+        """Return the topic if the input matches this template"""
+        match = self.pattern.match(user_input.strip())
+        return match.group("topic").strip() if match else None
+
+PLAN_TEMPLATES: List[PlanTemplate] = [
+    PlanTemplate(
+        name="complex_analysis",
+        pattern=r"^(?:please\s+)?(?:do|perform|run)\s+(?:a\s+)?complex\s+analysis\s+(?:on|of|for|about)\s+(?P<topic>.+?)[.!?]*$",
+        steps=("research_agent", "creative_agent"),
+        run=run_complex_analysis,
+    ),
+    PlanTemplate(
+        name="research_report",
+        pattern=r"^(?:please\s+)?research\s+and\s+(?:write\s+)?(?:a\s+)?report\s+(?:on|about)\s+(?P<topic>.+?)[.!?]*$",
+        steps=("research_agent", "creative_agent"),
+        run=run_complex_analysis,
+    ),
+]
+
+def match_plan_template(user_input: str) -> Optional[Tuple[PlanTemplate, str]]:
+    """Find the first template matching the input, with its extracted topic"""
+    for template in PLAN_TEMPLATES:
+        topic = template.match(user_input)
+        if topic:
+            return template, topic
+    return None